@@ -1,15 +1,22 @@
 #!/usr/bin/env python3
 """
 Comic Agent直接実行スクリプト
+
+プロジェクトルートで `python run_comic_agent.py` または
+`python -m run_comic_agent` として実行してください。
 """
-import sys
-import os
+import asyncio
 
-# プロジェクトルートをPythonパスに追加
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from google.genai import types
+from google.adk.sessions import InMemorySessionService
+from google.adk.runners import Runner
 
 from src.multi_tool_agent.agent import root_agent as comic_agent
 
+APP_NAME = "comic_agent_app"
+USER_ID = "user_1"
+SESSION_ID = "session_001"
+
 def main():
     """Comic Agentを直接実行"""
     print("🎭 Comic Agent起動中...")
@@ -21,78 +28,103 @@ def main():
     print(f"利用可能ツール: {[tool.__name__ for tool in comic_agent.tools]}")
     print("=" * 50)
     
-    # 対話開始
-    print("💬 エージェントと対話を開始します")
-    print("（終了するには 'quit' または 'exit' を入力）")
-    print()
+    async def create_runner():
+        # セッション管理の設定（対話全体で1つのセッションを使い回す）
+        session_service = InMemorySessionService()
+        
+        # セッション作成
+        await session_service.create_session(
+            app_name=APP_NAME,
+            user_id=USER_ID,
+            session_id=SESSION_ID
+        )
+        
+        # ランナー作成
+        return Runner(
+            agent=comic_agent,
+            app_name=APP_NAME,
+            session_service=session_service
+        )
     
-    while True:
+    async def run_agent_async(runner, user_input):
+        # ユーザーメッセージの準備
+        content = types.Content(role='user', parts=[types.Part(text=user_input)])
+        
+        # エージェント実行（正しいAPIに修正）
+        events = runner.run_async(
+            user_id=USER_ID,
+            session_id=SESSION_ID,
+            content=content
+        )
+        
+        # レスポンスの取得（最終応答で抜けた後もジェネレータはこのターン内で閉じる）
         try:
-            user_input = input("あなた: ").strip()
-            
-            if user_input.lower() in ['quit', 'exit', '終了']:
-                print("👋 Comic Agentを終了します")
-                break
-                
-            if not user_input:
-                continue            # エージェントに質問
-            print("🤖 Comic Agent: 考え中...")
-            
-            # ADK用のasync実行関数
-            import asyncio
-            from google.genai import types
-            from google.adk.sessions import InMemorySessionService
-            from google.adk.runners import Runner
-            
-            async def run_agent_async():
-                # セッション管理の設定
-                session_service = InMemorySessionService()
-                APP_NAME = "comic_agent_app"
-                USER_ID = "user_1"
-                SESSION_ID = "session_001"
+            async for event in events:
+                if event.is_final_response():
+                    return event.response.candidate.content.parts[0].text
+        finally:
+            await events.aclose()
                 
-                # セッション作成
-                session = await session_service.create_session(
-                    app_name=APP_NAME,
-                    user_id=USER_ID,
-                    session_id=SESSION_ID
-                )
-                
-                # ランナー作成
-                runner = Runner(
-                    agent=comic_agent,
-                    app_name=APP_NAME,
-                    session_service=session_service
-                )
+        return "エージェントからの応答がありませんでした。"
+    
+    # イベントループは対話全体で1つだけ作成（毎ターン作り直さない）
+    # input() はメインスレッドで呼ぶため、Ctrl+C はこれまで通り KeyboardInterrupt になる
+    loop = asyncio.new_event_loop()
+    try:
+        try:
+            runner = loop.run_until_complete(create_runner())
+        except Exception as e:
+            print(f"❌ セッションの作成に失敗しました: {e}")
+            print("再試行してください")
+            return
+        
+        # 対話開始
+        print("💬 エージェントと対話を開始します")
+        print("（終了するには 'quit' または 'exit' を入力）")
+        print()
+        
+        while True:
+            try:
+                user_input = input("あなた: ").strip()
                 
-                # ユーザーメッセージの準備
-                content = types.Content(role='user', parts=[types.Part(text=user_input)])
+                if user_input.lower() in ['quit', 'exit', '終了']:
+                    print("👋 Comic Agentを終了します")
+                    break
+                    
+                if not user_input:
+                    continue            # エージェントに質問
+                print("🤖 Comic Agent: 考え中...")
                 
-                # エージェント実行（正しいAPIに修正）
-                events = runner.run_async(
-                    user_id=USER_ID,
-                    session_id=SESSION_ID,
-                    content=content
-                )
+                # 非同期実行
+                response = loop.run_until_complete(run_agent_async(runner, user_input))
+                print(f"🤖 Comic Agent: {response}")
+                print()
                 
-                # レスポンスの取得
-                async for event in events:
-                    if event.is_final_response():
-                        return event.response.candidate.content.parts[0].text
-                        
-                return "エージェントからの応答がありませんでした。"
-            
-            # 非同期実行
-            response = asyncio.run(run_agent_async())
-            print(f"🤖 Comic Agent: {response}")
-            print()
-            
-        except KeyboardInterrupt:
-            print("\n👋 Comic Agentを終了します")
-            break
-        except Exception as e:
-            print(f"❌ エラーが発生しました: {e}")
-            print("再試行してください")
+            except KeyboardInterrupt:
+                print("\n👋 Comic Agentを終了します")
+                break
+            except Exception as e:
+                print(f"❌ エラーが発生しました: {e}")
+                print("再試行してください")
+    finally:
+        _shutdown_loop(loop)
+
+def _shutdown_loop(loop):
+    """asyncio.run() と同じ手順でイベントループを後始末して閉じる
+    
+    Ctrl+C で中断されたターンのタスクをキャンセルし、途中で抜けた
+    runner.run_async() の非同期ジェネレータを閉じてから loop.close() する。
+    """
+    try:
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.run_until_complete(loop.shutdown_default_executor())
+    finally:
+        loop.close()
 
 if __name__ == "__main__":
     main()
@@ -1,32 +1,42 @@
+import asyncio
+import hashlib
+import json
 import os
+import re
+import sqlite3
+import unicodedata
+from contextlib import closing
+from pathlib import Path
+import google.generativeai as genai
 from dotenv import load_dotenv
 from google.adk.agents import Agent
 
+# orjsonがあれば物語JSONの読み書きに使う（なければ標準のjson）
+try:
+    import orjson
+    _json_loads = orjson.loads
+    
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
 # .envファイルから環境変数を読み込み
 load_dotenv()
 
-def generate_story_for_comic(genre: str) -> dict:
-    """指定されたジャンルに基づいて漫画の物語構造を生成します。
-    
-    Args:
-        genre (str): 物語のジャンル（例: ファンタジー, SF, コメディ）
-        
-    Returns:
-        dict: 物語構造（タイトル、キャラクター、プロット、テーマ）
-    """
-    import google.generativeai as genai
-    import json
-    
-    # APIキーを設定
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return {"status": "error", "error_message": "GEMINI_API_KEY not found in environment variables."}
-    
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        prompt = f"""
+STORY_MODEL_NAME = 'gemini-1.5-flash'
+
+# 生成済み物語のキャッシュ（同じジャンル・モデル・プロンプトならAPIを呼ばない）
+STORY_CACHE_PATH = Path.home() / ".cache" / "comic-agent" / "stories.db"
+
+# LLM応答を囲む ```json ... ``` マークダウンを除去するパターン
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.DOTALL)
+
+# 物語生成プロンプト（{genre} 以外は固定なので読み込み時に一度だけ組み立てる）
+_STORY_PROMPT_TEMPLATE = """
 あなたはプロの漫画ストーリー作家です。{genre}ジャンルの魅力的な漫画の基本構造を作成してください。
 
 以下のJSON形式で回答してください：
@@ -51,33 +61,304 @@ def generate_story_for_comic(genre: str) -> dict:
 ```
 
 JSON以外の余計な文字は含めないでください。
-        """
-        
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        
-        # ```json``` マークダウンを削除
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
+"""
+
+# 物語JSONに必須のキー
+_STORY_KEYS = ("title", "characters", "plot", "themes")
+_CHARACTER_KEYS = ("name", "role", "description")
+_PLOT_KEYS = ("setup", "conflict", "resolution")
+
+def _require_keys(data, keys, name: str) -> None:
+    """dataが必須キーをすべて持つオブジェクトか確認します（違反時はValueError）"""
+    if not isinstance(data, dict):
+        raise ValueError(f"{name} must be object")
+    missing = [key for key in keys if key not in data]
+    if missing:
+        raise ValueError(f"{name} is missing {missing}")
+
+def _validate_story(data) -> None:
+    """物語JSONの構造を検証します（違反時はValueError）"""
+    _require_keys(data, _STORY_KEYS, "story")
+    if not isinstance(data["title"], str):
+        raise ValueError("title must be string")
+    if not isinstance(data["characters"], list):
+        raise ValueError("characters must be array")
+    for i, character in enumerate(data["characters"]):
+        _require_keys(character, _CHARACTER_KEYS, f"characters[{i}]")
+    _require_keys(data["plot"], _PLOT_KEYS, "plot")
+    if not isinstance(data["themes"], list):
+        raise ValueError("themes must be array")
+
+# 途中で切れたJSON応答から読み取れた部分だけを取り出すためのデコーダ
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WS_RE = re.compile(r"[ \t\n\r]*")
+_JSON_START_RE = re.compile(r"[{\[]")
+
+def _story_cache_key(genre: str, model_name: str, prompt: str) -> str:
+    """物語キャッシュのキーを計算します（ジャンルはNFC正規化済みであること）"""
+    payload = "\x1f".join([genre, model_name.lower(), prompt])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _connect_story_cache() -> sqlite3.Connection:
+    """物語キャッシュのSQLiteファイルを開きます（なければ作成）"""
+    STORY_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(STORY_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS stories (key TEXT PRIMARY KEY, json TEXT)"
+    )
+    return conn
+
+# SQLiteから読んだ/書いた物語JSONのプロセス内メモ（キャッシュキー → JSON文字列）
+_STORY_MEMO: dict = {}
+
+def _cached_story(key: str):
+    """キャッシュ済みの物語JSONを返します（未登録ならNone）"""
+    story_json = _STORY_MEMO.get(key)
+    if story_json is None:
+        with closing(_connect_story_cache()) as conn:
+            row = conn.execute("SELECT json FROM stories WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        story_json = _STORY_MEMO[key] = row[0]
+    return story_json
+
+def _store_story(key: str, story_json: str) -> None:
+    """生成した物語JSONをキャッシュに保存します（同じキーがあれば上書き）"""
+    with closing(_connect_story_cache()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO stories (key, json) VALUES (?, ?)",
+            (key, story_json),
+        )
+    _STORY_MEMO[key] = story_json
+
+# genai.configureに渡したAPIキー（同じキーでの再設定を省くため）
+_configured_api_key = None
+
+# 生成モデルは (モデル名, temperature, max_tokens) ごとに使い回す
+_MODEL_CACHE: dict = {}
+
+def _ensure_configured(api_key: str) -> None:
+    """genai.configureを一度だけ（APIキーが変わった場合は再度）呼び出します"""
+    global _configured_api_key
+    if _configured_api_key != api_key:
+        genai.configure(api_key=api_key)
+        _configured_api_key = api_key
+
+def _get_model(model_name: str, temperature: float = None, max_tokens: int = None):
+    """JSON出力用に設定したGenerativeModelを返します（生成済みなら再利用）"""
+    key = (model_name, temperature, max_tokens)
+    model = _MODEL_CACHE.get(key)
+    if model is None:
+        model = genai.GenerativeModel(
+            model_name,
+            generation_config=genai.types.GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=max_tokens,
+                response_mime_type="application/json"
+            ),
+        )
+        _MODEL_CACHE[key] = model
+    return model
+
+def generate_story_for_comic(genre: str) -> dict:
+    """指定されたジャンルに基づいて漫画の物語構造を生成します。
+    
+    Args:
+        genre (str): 物語のジャンル（例: ファンタジー, SF, コメディ）
         
-        story_data = json.loads(response_text.strip())
-        return {
-            "status": "success", 
-            "story": story_data
-        }
+    Returns:
+        dict: 物語構造（タイトル、キャラクター、プロット、テーマ）
+    """
+    return _generate_story(genre)
+
+def regenerate_story_for_comic(genre: str) -> dict:
+    """保存済みの物語を使わずに、指定ジャンルの漫画の物語構造を新しく生成し直します。
+    
+    同じジャンルで別の物語が欲しい場合に使います。生成結果は次回以降の
+    generate_story_for_comicでも使われます。
+    
+    Args:
+        genre (str): 物語のジャンル（例: ファンタジー, SF, コメディ）
         
+    Returns:
+        dict: 物語構造（タイトル、キャラクター、プロット、テーマ）
+    """
+    return _generate_story(genre, bypass_cache=True)
+
+def _generate_story(genre: str, bypass_cache: bool = False) -> dict:
+    """generate_story_for_comicの本体。bypass_cache=Trueでキャッシュを使わず再生成します。"""
+    try:
+        result, request = _prepare_story(genre, bypass_cache)
+        if result is not None:
+            return result
+        model, prompt, cache_key = request
+        response = model.generate_content(prompt)
+        return _story_result(response.text, cache_key)
+    except Exception as e:
+        return _generation_error(e)
+
+async def generate_story_for_comic_async(genre: str, bypass_cache: bool = False) -> dict:
+    """generate_story_for_comicの非同期版。戻り値の形式は同期版と同じです。
+    
+    キャッシュの読み書き（SQLite）はイベントループを止めないよう別スレッドで行います。
+    """
+    try:
+        result, request = await asyncio.to_thread(_prepare_story, genre, bypass_cache)
+        if result is not None:
+            return result
+        model, prompt, cache_key = request
+        response = await model.generate_content_async(prompt)
+        return await asyncio.to_thread(_story_result, response.text, cache_key)
+    except Exception as e:
+        return _generation_error(e)
+
+async def generate_stories_batch(genres: list, max_concurrency: int = 8,
+                                 bypass_cache: bool = False) -> list:
+    """複数ジャンルの物語を並行して生成します。
+    
+    同時リクエスト数はmax_concurrencyまでに抑えます（APIのレート制限対策）。
+    同じジャンル（NFC正規化後）が複数あってもAPIは一度だけ呼び、同じ結果を返します。
+    結果はgenresと同じ順序のリストで返します。
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def generate_one(genre: str) -> dict:
+        async with semaphore:
+            return await generate_story_for_comic_async(genre, bypass_cache)
+    
+    normalized = [unicodedata.normalize("NFC", genre) for genre in genres]
+    unique_genres = list(dict.fromkeys(normalized))
+    results = await asyncio.gather(*(generate_one(genre) for genre in unique_genres))
+    by_genre = dict(zip(unique_genres, results))
+    return [by_genre[genre] for genre in normalized]
+
+def _prepare_story(genre: str, bypass_cache: bool) -> tuple:
+    """生成の前処理（キャッシュ確認・APIキー確認・モデル取得）を行います。
+    
+    (そのまま返す結果, None) か (None, (モデル, プロンプト, キャッシュキー)) を返します。
+    """
+    prompt, cache_key = _story_request(genre)
+    cached = None if bypass_cache else _lookup_story(cache_key)
+    if cached is not None:
+        return cached, None
+    
+    # APIキーを設定
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return {"status": "error", "error_message": "GEMINI_API_KEY not found in environment variables."}, None
+    
+    _ensure_configured(api_key)
+    return None, (_get_model(STORY_MODEL_NAME), prompt, cache_key)
+
+def _generation_error(e: Exception) -> dict:
+    """生成中の例外をエラーレスポンスに変換します"""
+    return {
+        "status": "error", 
+        "error_message": f"Story generation failed: {str(e)}"
+    }
+
+def _story_request(genre: str) -> tuple:
+    """ジャンルから (プロンプト, キャッシュキー) を組み立てます"""
+    # 表記ゆれ（合成済み/分解済みの濁点など）で別キーにならないよう正規化
+    genre = unicodedata.normalize("NFC", genre)
+    prompt = _STORY_PROMPT_TEMPLATE.format(genre=genre)
+    return prompt, _story_cache_key(genre, STORY_MODEL_NAME, prompt)
+
+def _lookup_story(cache_key: str):
+    """キャッシュ済みの物語があれば成功レスポンスを、なければNoneを返します"""
+    try:
+        story_json = _cached_story(cache_key)
+    except (sqlite3.Error, OSError):
+        return None
+    if story_json is None:
+        return None
+    return {"status": "success", "story": _json_loads(story_json)}
+
+def _story_result(response_text: str, cache_key: str) -> dict:
+    """LLM応答テキストを物語構造に変換し、成功時はキャッシュに保存します"""
+    
+    # ```json``` マークダウンを削除
+    response_text = _FENCE_RE.sub("", response_text)
+    
+    try:
+        story_data = _json_loads(response_text)
+        complete = True
     except json.JSONDecodeError as e:
+        # 前後に余計な文章がある応答や途中で切れた応答でも、タイトル・登場人物・
+        # プロットが取れていればそれを使う（切れていた場合はpartial=Trueを付けて
+        # 返し、キャッシュはしない）
+        parsed = _partial_parse(response_text)
+        if parsed is None:
+            return {
+                "status": "error", 
+                "error_message": f"JSON parsing failed: {str(e)}"
+            }
+        story_data, complete = parsed
+    
+    # themesだけは省略されていても空リストで補う（完全な応答・途中で切れた応答とも同じ扱い）
+    if isinstance(story_data, dict):
+        story_data.setdefault("themes", [])
+    
+    try:
+        _validate_story(story_data)
+    except ValueError as e:
         return {
             "status": "error", 
-            "error_message": f"JSON parsing failed: {str(e)}"
+            "error_message": f"Invalid story structure: {str(e)}"
         }
-    except Exception as e:
+    
+    if not complete:
         return {
-            "status": "error", 
-            "error_message": f"Story generation failed: {str(e)}"
+            "status": "success", 
+            "story": story_data,
+            "partial": True
         }
+    
+    try:
+        _store_story(cache_key, _json_dumps(story_data))
+    except (sqlite3.Error, OSError):
+        pass
+    return {
+        "status": "success", 
+        "story": story_data
+    }
+
+def _partial_parse(text: str):
+    """不完全なJSONから、最後まで読み取れたトップレベルの項目だけを取り出します。
+    
+    先頭から一度だけ走査し、壊れた項目に到達した時点で打ち切ります。
+    (項目のdict, 閉じ括弧 '}' まで読めたか) を返します。
+    title・characters・plotが取れなかった場合や、トップレベルがオブジェクトでない
+    場合はNoneを返します（themesの補完は呼び出し側で行います）。
+    """
+    recovered = {}
+    complete = False
+    match = _JSON_START_RE.search(text)
+    if match is None or match.group() != "{":
+        return None
+    pos = match.end()
+    try:
+        while True:
+            pos = _JSON_WS_RE.match(text, pos).end()
+            key, pos = _JSON_DECODER.raw_decode(text, pos)
+            if not isinstance(key, str):
+                break
+            pos = _JSON_WS_RE.match(text, pos).end()
+            if text[pos] != ":":
+                break
+            pos = _JSON_WS_RE.match(text, pos + 1).end()
+            recovered[key], pos = _JSON_DECODER.raw_decode(text, pos)
+            pos = _JSON_WS_RE.match(text, pos).end()
+            if text[pos] != ",":
+                complete = text[pos] == "}"
+                break
+            pos += 1
+    except (json.JSONDecodeError, IndexError):
+        pass
+    
+    if any(key not in recovered for key in ("title", "characters", "plot")):
+        return None
+    return recovered, complete
 
 def get_weather(city: str) -> dict:
     """天気情報を取得します（デモ用のモックデータ）。
@@ -109,8 +390,9 @@ root_agent = Agent(
         "あなたは創造的な漫画ストーリージェネレーターです。"
         "ユーザーからジャンルを指定されたら、'generate_story_for_comic'ツールを使用して、"
         "そのジャンルに合った魅力的な物語構造を生成してください。"
+        "同じジャンルで別の物語を求められた場合は、'regenerate_story_for_comic'ツールを使用してください。"
         "天気について聞かれた場合は、'get_weather'ツールを使用してください。"
         "生成された物語は分かりやすく整理して表示してください。"
     ),
-    tools=[generate_story_for_comic, get_weather],
+    tools=[generate_story_for_comic, regenerate_story_for_comic, get_weather],
 )
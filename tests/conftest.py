@@ -0,0 +1,15 @@
+import logging
+from pathlib import Path
+
+def pytest_configure(config):
+    """テスト用のログ設定（xdistの各ワーカープロセスでも呼ばれるので、全プロセスがtest.logに追記する）"""
+    log_dir = Path(__file__).parent / "logs"
+    log_dir.mkdir(exist_ok=True)
+    
+    handler = logging.FileHandler(log_dir / "test.log", mode="a", encoding='utf-8')
+    handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s'
+    ))
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.DEBUG)
+    root_logger.addHandler(handler)
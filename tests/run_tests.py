@@ -1,31 +1,14 @@
-import unittest
-import logging
+import importlib.util
 from pathlib import Path
 
-def setup_test_logging():
-    """テスト用のログ設定"""
-    log_dir = Path(__file__).parent / "logs"
-    log_dir.mkdir(exist_ok=True)
-    
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_dir / "test.log", encoding='utf-8'),
-            logging.StreamHandler()
-        ]
-    )
+import pytest
 
 def run_tests():
-    """全テストを実行"""
-    setup_test_logging()
-    loader = unittest.TestLoader()
-    start_dir = Path(__file__).parent
-    suite = loader.discover(start_dir, pattern='test_*.py')
-    
-    runner = unittest.TextTestRunner(verbosity=2)
-    result = runner.run(suite)
-    return result.wasSuccessful()
+    """全テストを実行（pytest-xdistがあればCPUコア数分のプロセスで並列実行。ログ設定はconftest.py）"""
+    args = [str(Path(__file__).parent), "-v"]
+    if importlib.util.find_spec("xdist") is not None:
+        args += ["-n", "auto"]
+    return pytest.main(args) == 0
 
 if __name__ == '__main__':
     success = run_tests()
@@ -1,11 +1,10 @@
 import unittest
-from unittest.mock import patch, MagicMock
-import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
 import json
 from pathlib import Path
 import os
 import sys
-from datetime import datetime
+import time
 
 # Add the project root to sys.path to allow importing run_agent_fixed
 # This assumes the test is run from the project root or the 'tests' directory.
@@ -26,15 +25,19 @@ except ImportError as e:
         print("Dummy run_agent_main called due to import error.")
         pass 
 
-class TestRunAgentFixed(unittest.TestCase):
+class TestRunAgentFixed(unittest.IsolatedAsyncioTestCase):
+    JSON_GLOB = "story_*_テストジャンル.json"
+    TXT_GLOB = "story_*_テストジャンル.txt"
+
+    @classmethod
+    def setUpClass(cls):
+        # Ensure the stories directory exists (once for the whole class)
+        cls.stories_dir = Path("stories")
+        cls.stories_dir.mkdir(exist_ok=True)
 
     def setUp(self):
-        # Ensure the stories directory exists
-        self.stories_dir = Path("stories")
-        self.stories_dir.mkdir(exist_ok=True)
-        
         # Store current time to help identify files created during the test
-        self.test_start_time = datetime.now()
+        self.test_start_ns = time.time_ns()
 
         # Set a dummy API key if not present, as ADK might require it.
         # The actual LLM call will be mocked if this is a true unit test,
@@ -47,9 +50,9 @@ class TestRunAgentFixed(unittest.TestCase):
             os.environ["GEMINI_API_KEY"] = "test_api_key_for_run_agent_fixed"
 
 
-    @patch('run_agent_fixed.call_agent_async') # Mock the actual agent call
+    @patch('run_agent_fixed.call_agent_async', new_callable=AsyncMock) # Mock the actual agent call
     @patch('builtins.input', return_value='テストジャンル')
-    def test_generate_and_save_story(self, mock_input, mock_call_agent_async):
+    async def test_generate_and_save_story(self, mock_input, mock_call_agent_async):
         # Mock the response from the agent to control test data
         # This response should be what the agent is expected to return as a string
         mock_story_data = {
@@ -61,43 +64,29 @@ class TestRunAgentFixed(unittest.TestCase):
         mock_agent_response_str = json.dumps(mock_story_data)
         
         # Configure the mock for call_agent_async
-        # It's an async function, so its mock needs to be an AsyncMock
-        # or return an awaitable if it's called with await.
-        # Since we are mocking it directly, we can make it return the desired string.
-        async def mock_async_call(*args, **kwargs):
-            return mock_agent_response_str
-        mock_call_agent_async.side_effect = mock_async_call
+        # It's an async function, so it is patched with an AsyncMock;
+        # awaiting it yields return_value.
+        mock_call_agent_async.return_value = mock_agent_response_str
 
         # Run the main function from run_agent_fixed.py
         try:
-            asyncio.run(run_agent_main())
+            await run_agent_main()
         except Exception as e:
             self.fail(f"run_agent_main() raised an exception: {e}")
 
         # Find the created files
-        # We need to be careful here to find files created *after* test_start_time
+        # We need to be careful here to find files created *after* test_start_ns
         # or use a more robust way if filenames are very predictable.
         # For simplicity, we'll glob and assume the latest one is ours if multiple match.
         
         # A short delay to ensure files are written
-        # asyncio.run(asyncio.sleep(0.1)) # May not be needed depending on filesystem timing
+        # await asyncio.sleep(0.1) # May not be needed depending on filesystem timing
 
-        json_files = sorted(
-            [f for f in self.stories_dir.glob(f"story_*_テストジャンル.json") 
-             if datetime.fromtimestamp(f.stat().st_ctime) >= self.test_start_time],
-            key=lambda f: f.stat().st_ctime, reverse=True
-        )
-        txt_files = sorted(
-            [f for f in self.stories_dir.glob(f"story_*_テストジャンル.txt")
-             if datetime.fromtimestamp(f.stat().st_ctime) >= self.test_start_time],
-            key=lambda f: f.stat().st_ctime, reverse=True
-        )
+        latest_json_file = self._latest_story_file(self.JSON_GLOB)
+        latest_txt_file = self._latest_story_file(self.TXT_GLOB)
 
-        self.assertTrue(json_files, "No JSON file found for 'テストジャンル'")
-        self.assertTrue(txt_files, "No TXT file found for 'テストジャンル'")
-
-        latest_json_file = json_files[0]
-        latest_txt_file = txt_files[0]
+        self.assertIsNotNone(latest_json_file, "No JSON file found for 'テストジャンル'")
+        self.assertIsNotNone(latest_txt_file, "No TXT file found for 'テストジャンル'")
 
         # Verify JSON content
         with open(latest_json_file, 'r', encoding='utf-8') as f:
@@ -130,6 +119,12 @@ class TestRunAgentFixed(unittest.TestCase):
         except OSError as e:
             print(f"Warning: Could not delete test files {latest_json_file}, {latest_txt_file}: {e}")
 
+    def _latest_story_file(self, pattern):
+        # stat() once per candidate, then pick the newest in a single pass
+        entries = [(f, f.stat().st_ctime_ns) for f in self.stories_dir.glob(pattern)]
+        entries = [e for e in entries if e[1] >= self.test_start_ns]
+        return max(entries, key=lambda e: e[1], default=(None, 0))[0]
+
     def tearDown(self):
         # Clean up any environment variables set for the test if necessary
         if os.environ.get("GEMINI_API_KEY") == "test_api_key_for_run_agent_fixed":
@@ -1,14 +1,23 @@
+import tempfile
 import unittest
 from pathlib import Path
 import json
 import yaml
 from agents.story_agent import SimpleStoryAgent
 
+# libyamlがあればC実装のDumperを使う
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeDumper
+
 class TestSimpleStoryAgent(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """テストクラスの初期化"""
-        cls.test_config_path = Path(__file__).parent / "test_config.yaml"
+        # テスト用の設定ファイルは一時ディレクトリに置く（リポジトリを汚さない）
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.test_config_path = Path(cls._tmp.name) / "test_config.yaml"
         cls.test_genre = "ファンタジー"
         
         # テスト用の設定ファイルを作成
@@ -31,13 +40,12 @@ class TestSimpleStoryAgent(unittest.TestCase):
             ]
         }
         with open(cls.test_config_path, 'w', encoding='utf-8') as f:
-            yaml.dump(test_config, f, allow_unicode=True)
-
-    def setUp(self):
-        """各テストケースの前に実行"""
-        self.agent = SimpleStoryAgent(
-            genre=self.test_genre,
-            config_path=str(self.test_config_path)
+            yaml.dump(test_config, f, Dumper=SafeDumper, allow_unicode=True)
+        
+        # 設定ファイルの読み込みはクラスで一度だけ（各テストでエージェントを共有）
+        cls.agent = SimpleStoryAgent(
+            genre=cls.test_genre,
+            config_path=str(cls.test_config_path)
         )
 
     def test_initialization(self):
@@ -117,8 +125,8 @@ class TestSimpleStoryAgent(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         """テストクラスのクリーンアップ"""
-        # テスト用の設定ファイルを削除
-        cls.test_config_path.unlink(missing_ok=True)
+        # テスト用の設定ファイルを一時ディレクトリごと削除
+        cls._tmp.cleanup()
 
 def load_tests(loader, standard_tests, pattern):
     """テストスイートを定義"""
@@ -0,0 +1,238 @@
+import json
+import tempfile
+import unicodedata
+import unittest
+from unittest.mock import patch
+from types import SimpleNamespace
+from pathlib import Path
+import sys
+
+# プロジェクトルートをパスに追加（src.multi_tool_agent をインポートするため）
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from src.multi_tool_agent import agent as story_tool
+except ImportError as e:
+    # google-adk / google-generativeai / python-dotenv が入っていない環境ではスキップ
+    story_tool = None
+    IMPORT_ERROR = str(e)
+else:
+    IMPORT_ERROR = ""
+
+STORY_JSON = (
+    '{"title": "テストの物語", '
+    '"characters": [{"name": "主人公", "role": "主役", "description": "テスト用の主人公"}], '
+    '"plot": {"setup": "導入部", "conflict": "葛藤部", "resolution": "解決部"}, '
+    '"themes": ["友情", "成長"]}'
+)
+
+def use_temp_story_cache(test_case):
+    """物語キャッシュを一時ディレクトリのSQLiteに差し替える（テスト終了時に元に戻す）"""
+    tmp = tempfile.TemporaryDirectory()
+    patches = [
+        patch.object(story_tool, "STORY_CACHE_PATH", Path(tmp.name) / "stories.db"),
+        patch.dict(story_tool._STORY_MEMO, clear=True),
+    ]
+    for p in patches:
+        p.start()
+        test_case.addCleanup(p.stop)
+    test_case.addCleanup(tmp.cleanup)
+
+@unittest.skipIf(story_tool is None, f"story tool not importable: {IMPORT_ERROR}")
+class TestPartialParse(unittest.TestCase):
+    """途中で切れたLLM応答からの物語復元のテスト"""
+
+    def test_truncated_mid_value(self):
+        """値の途中で切れた場合は、それより前の項目だけを復元する"""
+        text = STORY_JSON[:STORY_JSON.index('"成長"') + 3]
+        story, complete = story_tool._partial_parse(text)
+        self.assertFalse(complete)
+        self.assertEqual(story["title"], "テストの物語")
+        self.assertEqual(len(story["characters"]), 1)
+        self.assertEqual(story["plot"]["resolution"], "解決部")
+        self.assertNotIn("themes", story)
+
+    def test_truncated_mid_key(self):
+        """キーの途中で切れた場合も、それまでの項目を復元する"""
+        text = STORY_JSON[:STORY_JSON.index('"themes"') + 4]
+        story, complete = story_tool._partial_parse(text)
+        self.assertFalse(complete)
+        self.assertEqual(story["title"], "テストの物語")
+        self.assertNotIn("themes", story)
+
+    def test_leading_prose(self):
+        """'{' より前の文章は読み飛ばす"""
+        story, complete = story_tool._partial_parse("以下が物語です：\n" + STORY_JSON)
+        self.assertTrue(complete)
+        self.assertEqual(story["themes"], ["友情", "成長"])
+
+    def test_trailing_garbage(self):
+        """オブジェクトの後ろに余計な文字があっても全項目を復元する"""
+        story, complete = story_tool._partial_parse(STORY_JSON + "\n以上です。")
+        self.assertTrue(complete)
+        self.assertEqual(story["title"], "テストの物語")
+        self.assertEqual(story["themes"], ["友情", "成長"])
+
+    def test_non_object_top_level(self):
+        """トップレベルがオブジェクトでなければ復元しない"""
+        self.assertIsNone(story_tool._partial_parse("[" + STORY_JSON + "]"))
+        self.assertIsNone(story_tool._partial_parse('"物語"'))
+
+    def test_missing_plot(self):
+        """plotが取れていなければ復元しない"""
+        text = STORY_JSON[:STORY_JSON.index('"plot"')]
+        self.assertIsNone(story_tool._partial_parse(text))
+
+    def test_missing_characters(self):
+        """charactersが取れていなければ復元しない"""
+        text = STORY_JSON[:STORY_JSON.index('"characters"') + 20]
+        self.assertIsNone(story_tool._partial_parse(text))
+
+@unittest.skipIf(story_tool is None, f"story tool not importable: {IMPORT_ERROR}")
+class TestValidateStory(unittest.TestCase):
+    """物語JSONの構造検証のテスト"""
+
+    def test_valid_story(self):
+        """必須キーがそろっていれば例外を出さない"""
+        story_tool._validate_story(json.loads(STORY_JSON))
+
+    def test_invalid_story(self):
+        """必須キーの欠落や型違いはValueError"""
+        broken = [
+            [],
+            {"title": "t", "characters": [], "plot": {}},
+            {"title": 1, "characters": [], "plot": {}, "themes": []},
+            {"title": "t", "characters": [{"name": "n"}], "themes": [],
+             "plot": {"setup": "", "conflict": "", "resolution": ""}},
+            {"title": "t", "characters": [], "themes": [], "plot": {"setup": ""}},
+        ]
+        for data in broken:
+            with self.subTest(data=data):
+                with self.assertRaises(ValueError):
+                    story_tool._validate_story(data)
+
+@unittest.skipIf(story_tool is None, f"story tool not importable: {IMPORT_ERROR}")
+class TestStoryCache(unittest.TestCase):
+    """生成済み物語キャッシュのテスト（一時ディレクトリのSQLiteを使う）"""
+
+    def setUp(self):
+        use_temp_story_cache(self)
+
+    def test_key_normalizes_genre(self):
+        """合成済み/分解済みの表記ゆれがあるジャンルは同じキーになる"""
+        composed = "ファンタジー"
+        decomposed = unicodedata.normalize("NFD", composed)
+        self.assertNotEqual(composed, decomposed)
+        self.assertEqual(
+            story_tool._story_request(composed)[1],
+            story_tool._story_request(decomposed)[1]
+        )
+
+    def test_key_ignores_model_name_case(self):
+        """モデル名の大文字・小文字はキーに影響しない"""
+        self.assertEqual(
+            story_tool._story_cache_key("SF", "Gemini-1.5-Flash", "prompt"),
+            story_tool._story_cache_key("SF", "gemini-1.5-flash", "prompt")
+        )
+
+    def test_miss_then_hit(self):
+        """未登録ならNone、保存後はSQLiteからも読み出せる"""
+        _, key = story_tool._story_request("SF")
+        self.assertIsNone(story_tool._lookup_story(key))
+        
+        story_tool._store_story(key, STORY_JSON)
+        story_tool._STORY_MEMO.clear()
+        cached = story_tool._lookup_story(key)
+        self.assertEqual(cached["status"], "success")
+        self.assertEqual(cached["story"], json.loads(STORY_JSON))
+
+    def test_complete_result_is_cached(self):
+        """完全な応答は検証後にキャッシュされる"""
+        _, key = story_tool._story_request("SF")
+        result = story_tool._story_result(STORY_JSON, key)
+        self.assertEqual(result["status"], "success")
+        self.assertNotIn("partial", result)
+        self.assertEqual(story_tool._lookup_story(key)["story"], result["story"])
+
+    def test_missing_themes_same_on_both_paths(self):
+        """themesがない物語は、完全な応答でも途中で切れた応答でも空リストで補う"""
+        _, key = story_tool._story_request("SF")
+        no_themes = json.loads(STORY_JSON)
+        del no_themes["themes"]
+        complete_text = json.dumps(no_themes, ensure_ascii=False)
+        
+        complete = story_tool._story_result(complete_text, key)
+        truncated = story_tool._story_result(complete_text[:-1] + ', "the', key)
+        
+        for result in (complete, truncated):
+            self.assertEqual(result["status"], "success")
+            self.assertEqual(result["story"]["themes"], [])
+        self.assertNotIn("partial", complete)
+        self.assertTrue(truncated["partial"])
+
+    def test_result_with_leading_prose_is_cached(self):
+        """前置きの文章があっても最後まで読めた応答は完全な結果としてキャッシュする"""
+        _, key = story_tool._story_request("SF")
+        result = story_tool._story_result("以下が物語です：\n" + STORY_JSON, key)
+        self.assertEqual(result["status"], "success")
+        self.assertNotIn("partial", result)
+        self.assertEqual(story_tool._lookup_story(key)["story"], result["story"])
+
+    def test_partial_result_is_not_cached(self):
+        """途中で切れた応答から復元した物語はキャッシュしない"""
+        _, key = story_tool._story_request("SF")
+        text = STORY_JSON[:STORY_JSON.index('"成長"') + 3]
+        result = story_tool._story_result(text, key)
+        self.assertEqual(result["status"], "success")
+        self.assertTrue(result["partial"])
+        self.assertIsNone(story_tool._lookup_story(key))
+
+class FakeModel:
+    """generate_content_asyncの呼び出し回数を数えるだけのモデル"""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_content_async(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(text=STORY_JSON)
+
+@unittest.skipIf(story_tool is None, f"story tool not importable: {IMPORT_ERROR}")
+class TestStoryBatch(unittest.IsolatedAsyncioTestCase):
+    """非同期の一括生成のテスト（APIは呼ばない）"""
+
+    def setUp(self):
+        use_temp_story_cache(self)
+        self.model = FakeModel()
+        patches = [
+            patch.object(story_tool, "_get_model", return_value=self.model),
+            patch.object(story_tool, "_ensure_configured"),
+            patch.dict("os.environ", {"GEMINI_API_KEY": "test_api_key_for_story_tool"}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    async def test_duplicate_genres_call_api_once(self):
+        """同じジャンルはAPIを一度だけ呼び、入力と同じ順序で結果を返す"""
+        genres = ["SF", "ファンタジー", unicodedata.normalize("NFD", "ファンタジー"), "SF"]
+        results = await story_tool.generate_stories_batch(genres)
+        
+        self.assertEqual(len(self.model.prompts), 2)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(r["status"] == "success" for r in results))
+        self.assertIs(results[0], results[3])
+        self.assertIs(results[1], results[2])
+
+    async def test_bypass_cache_is_passed_through(self):
+        """bypass_cache=Trueならキャッシュ済みでも再生成する"""
+        await story_tool.generate_stories_batch(["SF"])
+        await story_tool.generate_stories_batch(["SF"])
+        self.assertEqual(len(self.model.prompts), 1)
+        
+        await story_tool.generate_stories_batch(["SF"], bypass_cache=True)
+        self.assertEqual(len(self.model.prompts), 2)
+
+if __name__ == '__main__':
+    unittest.main()